@@ -1,6 +1,5 @@
 """Commands for preserving Discord messages in another channel."""
 import logging
-import re
 
 from discord import Embed, TextChannel, Colour, Message
 from discord.ext.commands import (Cog, CommandError, MessageConverter,
@@ -59,36 +58,40 @@ class Cryochamber(Cog):
                  f' {context.message.content}')
         get_channel = TextChannelConverter().convert
         get_message = MessageConverter().convert
-        # regex test link: https://regex101.com/r/kb819e/1
-        exp = r'(?P<source_specifier>.*?) in (?P<destination_channel_specifier>.*?)'
-        command_match = re.fullmatch(exp, arg)
+        # split on the last ' in ', so sources containing ' in ' still parse;
+        # a plain split beats a regex for a fixed separator
+        source_specifier, separator, destination_channel_specifier = arg.rpartition(' in ')
 
-        if command_match is None:
+        if not separator:
             raise CommandError('wrong syntax: ' + arg)
 
-        dest_channel = await get_channel(context,
-                                         command_match.group('destination_channel_specifier'))
+        dest_channel = await get_channel(context, destination_channel_specifier)
         if not dest_channel.permissions_for(context.message.author).manage_messages:
             return await context.send('You do not have the proper permissions to use this command.')
 
-        # regex test link: https://regex101.com/r/pMzemV/1/
-        exp = r'(?:(?P<temporal_modifier>future|no more) )' \
-              r'?pins from (?P<source_channel_specifier>.*?)'
-        source_channel_match = re.fullmatch(exp,
-                                            command_match.group('source_specifier'))
+        temporal_modifier = None
+        pins_specifier = source_specifier
+        for modifier in ('future', 'no more'):
+            if pins_specifier.startswith(modifier + ' '):
+                temporal_modifier = modifier
+                pins_specifier = pins_specifier[len(modifier) + 1:]
+                break
 
-        if source_channel_match is None:
-            source_message = await get_message(context, command_match.group('source_specifier'))
+        if not pins_specifier.startswith('pins from '):
+            source_message = await get_message(context, source_specifier)
             await self._preserve_message(source_message, dest_channel)
         else:
-            src_channel = await get_channel(context,
-                                            source_channel_match.group('source_channel_specifier'))
-            temporal_modifier = source_channel_match.group('temporal_modifier')
+            src_channel = await get_channel(context, pins_specifier[len('pins from '):])
 
             if temporal_modifier is None:
-                # immediate mode: copy currently pinned messages now.
-                for pin in sorted(await src_channel.pins(), key=lambda message: message.created_at):
-                    await self._preserve_message(pin, dest_channel)
+                # immediate mode: copy currently pinned messages now. Build every
+                # embed up front, then await the sends one at a time — concurrent
+                # sends complete in arbitrary order, which would break the
+                # documented earliest-first reposting.
+                pins = sorted(await src_channel.pins(), key=lambda message: message.created_at)
+                embeds = [self._preserved_embed(pin) for pin in pins]
+                for embed in embeds:
+                    await dest_channel.send(embed=embed)
             elif temporal_modifier == 'future':
                 # future mode: set up preservation of future pins.
                 self.ongoing_preservations.add((src_channel.name, dest_channel.name))
@@ -107,24 +110,29 @@ class Cryochamber(Cog):
         await context.send(str(self.ongoing_preservations))
 
     async def _preserve_message(self, message: Message, channel: TextChannel):
-        """Sends the preserved message. It formats an embed containing the original message with a
-        link back to the original as well as denoting how many attachments there are. It will only
-        embed the first image included."""
+        """Sends the preserved message."""
+        await channel.send(embed=self._preserved_embed(message))
+
+    def _preserved_embed(self, message: Message) -> Embed:
+        """Formats an embed containing the original message with a link back to the original as
+        well as denoting how many attachments there are. It will only embed the first image
+        included."""
+        num_attachments = len(message.attachments)
         attach_str = ""
-        if len(message.attachments) > 0:
-            attach_str = "" + str(len(message.attachments)) + " attachment" +\
-                         ("s" if len(message.attachments) > 1 else "") + ""
+        if num_attachments > 0:
+            attach_str = f"{num_attachments} attachment{'s' if num_attachments > 1 else ''}"
 
         embedded_msg = Embed(colour=Colour(0xf403f),
                              description=message.content,
                              timestamp=message.created_at)
-        embedded_msg.set_author(name=message.author.name + '#' + message.author.discriminator +
-                                ", aka " + message.author.display_name,
+        embedded_msg.set_author(name=f"{message.author.name}#{message.author.discriminator},"
+                                f" aka {message.author.display_name}",
                                 icon_url=str(message.author.avatar_url))
         embedded_msg.add_field(name="__              __",
-                               value=attach_str + " [(original)](" + message.jump_url + ")")
-        embedded_msg.set_footer(text="in #" + message.channel.name)
+                               value=f"{attach_str} [(original)]({message.jump_url})")
+        embedded_msg.set_footer(text=f"in #{message.channel.name}")
         for attach in message.attachments:
             if attach.width is not None and attach.height is not None:
                 embedded_msg.set_image(url=attach.url)
-        await channel.send(embed=embedded_msg)
+                break  # the embed only holds one image
+        return embedded_msg
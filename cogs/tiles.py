@@ -1,12 +1,10 @@
 """Commands for sending rendered game tiles as attachments."""
 import asyncio
-import concurrent.futures
 import logging
 import random
 
 from discord import File
 from discord.ext.commands import Cog, Context, command
-from fuzzywuzzy import process
 from hagadias.qudtile import QUD_COLORS, QudTile
 
 from shared import qindex
@@ -41,6 +39,10 @@ class Tiles(Cog):
                 msg = "Sorry, that specific object wasn't found, and it's too short to search."
                 return await ctx.send(msg)
             # there was no exact match, and the query wasn't too short, so offer an alternative
+            # fuzzywuzzy pulls in compiled extensions and is only needed on this
+            # fallback path, so import it lazily rather than at bot startup
+            import concurrent.futures
+            from fuzzywuzzy import process
             loop = asyncio.get_running_loop()
             # doing a fuzzy match on the qindex keys can take about 2 seconds, so
             # run in an executor so we can keep processing other commands in the meantime
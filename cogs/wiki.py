@@ -6,15 +6,37 @@ API help:
 https://cavesofqud.gamepedia.com/api.php?action=help&modules=query%2Bsearch
 """
 
+import asyncio
+import concurrent.futures
 import logging
+import os
+import pickle
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import quote
 
+import numpy as np
+import orjson
 from discord import Colour, Embed
 from discord.ext.commands import Bot, Cog, Context, command
+from rapidfuzz import fuzz, process, utils
 
 from shared import config, http_session
 
 log = logging.getLogger('bot.' + __name__)
 
+TITLES_CACHE_SECONDS = 15 * 60  # how long to reuse the cached list of article titles
+TITLES_CACHE_FILE = 'wiki_titles.cache'  # on-disk copy of the cache, for warm restarts
+QUERY_CACHE_SIZE = 128  # how many recent ?wiki replies to keep
+
+# starting points for the concurrent slices of the allpages crawl; each slice
+# walks from its own boundary up to the next one
+TITLE_SHARDS = ('', 'F', 'M', 'S')
+
+# the search API highlights matches with these tags; we render them as Markdown bold
+SEARCHMATCH_PATTERN = re.compile(r'<span class="searchmatch">|</span>')
+
 
 class Wiki(Cog):
     """Search the official Caves of Qud wiki."""
@@ -23,55 +45,200 @@ class Wiki(Cog):
         self.bot = bot
         self.title_limit = config['wiki title search limit']
         self.fulltext_limit = config['wiki fulltext search limit']
+        self.fuzzy_cutoff = config['wiki fuzzy match cutoff']
+        self.namespaces = config['wiki search namespaces']
         self.url = 'https://' + config['wiki'] + '/api.php'
+        self.base_url = 'https://' + config['wiki'] + '/'
+        self.titles_list = []  # every article title; aligned with the list below
+        self.processed_list = []  # the normalized titles, for batch scoring
+        self.all_titles_stamp = 0.0  # time of the last successful titles cache refresh
+        self.refreshing = None  # the background cache refresh task, if one is running
+        self.query_cache = OrderedDict()  # LRU of recent query replies
+        # one persistent pool for fuzzy matching, rather than spawning threads per command
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=2,
+                                                          thread_name_prefix='wiki-fuzzy')
+        self._load_titles_cache()
+
+    def cog_unload(self):
+        self.pool.shutdown(wait=False)
+
+    async def read_titles(self, namespace: int) -> dict:
+        """Return a dict mapping every article title in a namespace to its page ID.
+
+        Successive batches within one crawl must wait on the previous apcontinue
+        token, so the alphabet is split into shards that are crawled concurrently."""
+        bounds = list(TITLE_SHARDS) + [None]
+        shards = await asyncio.gather(*(self._read_shard(namespace, apfrom, apto)
+                                        for apfrom, apto in zip(bounds, bounds[1:])))
+        titles = {}
+        for shard in shards:
+            titles.update(shard)
+        return titles
+
+    async def _read_shard(self, namespace: int, apfrom: str, apto) -> dict:
+        """Crawl one alphabetical slice of a namespace's titles.
+
+        Walks batches from apfrom and stops once the continue token reaches apto
+        (exclusive; None means crawl to the end). Any overlap at a boundary is
+        deduplicated when the shards are merged."""
+        titles = {}
+        params = {'format': 'json',
+                  'formatversion': 2,
+                  'action': 'query',
+                  'list': 'allpages',
+                  'apnamespace': namespace,
+                  'apfrom': apfrom,
+                  'aplimit': 500}
+        while True:
+            async with http_session.get(url=self.url, params=params) as reply:
+                response = orjson.loads(await reply.read())
+            for page in response['query']['allpages']:
+                titles[page['title']] = page['pageid']
+            if 'continue' not in response:
+                break
+            apcontinue = response['continue']['apcontinue']
+            if apto is not None and apcontinue >= apto:
+                break  # the next shard takes over from here
+            params['apcontinue'] = apcontinue
+        return titles
+
+    async def refresh_titles_cache(self):
+        """Reload the cached article titles if they are older than TITLES_CACHE_SECONDS.
+
+        If the cache is stale but usable, serve it as-is and refresh in the background,
+        so callers only wait on the wiki API during a cold start."""
+        if time.time() - self.all_titles_stamp < TITLES_CACHE_SECONDS:
+            return
+        if self.titles_list:
+            if self.refreshing is None or self.refreshing.done():
+                self.refreshing = asyncio.create_task(self._do_refresh())
+                self.refreshing.add_done_callback(self._log_refresh_failure)
+            return
+        await self._do_refresh()
+
+    @staticmethod
+    def _log_refresh_failure(task):
+        """Log any exception from the background refresh task, which nothing awaits."""
+        if not task.cancelled() and task.exception() is not None:
+            log.error('Wiki titles cache refresh failed.', exc_info=task.exception())
+
+    async def _do_refresh(self):
+        """Fetch a fresh title list and swap it into the cache."""
+        # the namespace fetches are independent, so overlap them on the wire
+        namespace_titles = await asyncio.gather(*(self.read_titles(namespace)
+                                                  for namespace in self.namespaces))
+        new_titles = {}
+        for titles in namespace_titles:
+            new_titles.update(titles)
+        self._index_titles(new_titles)
+        self.all_titles_stamp = time.time()
+        self._save_titles_cache(new_titles)
+        log.info(f'Refreshed the wiki titles cache ({len(self.titles_list)} titles).')
+
+    def _index_titles(self, new_titles: dict):
+        """Build the fuzzy match index from a title -> page ID dict.
+
+        The index is two parallel lists — original titles and normalized titles
+        (computed once here rather than on every query) — so match results map
+        back to the original titles by position instead of dict lookups. The page
+        IDs aren't indexed; the on-disk cache keeps the full dict for them."""
+        self.titles_list = list(new_titles.keys())
+        self.processed_list = [utils.default_process(title) for title in self.titles_list]
+
+    def _load_titles_cache(self):
+        """Warm the titles cache from disk, if a previous run left a usable copy."""
+        try:
+            with open(TITLES_CACHE_FILE, 'rb') as f:
+                data = pickle.load(f)
+            self._index_titles(data['titles'])
+            self.all_titles_stamp = data['stamp']
+            log.info(f'Loaded {len(self.titles_list)} wiki titles from {TITLES_CACHE_FILE}.')
+        except FileNotFoundError:
+            pass  # no cache on disk yet; the first ?wiki will fetch a fresh one
+        except Exception as e:  # the cache is best-effort, so never block cog load
+            log.warning(f'Ignoring unusable wiki titles cache {TITLES_CACHE_FILE}: {e!r}')
+
+    def _save_titles_cache(self, titles: dict):
+        """Write the titles cache to disk so the next bot launch starts warm."""
+        try:
+            with open(TITLES_CACHE_FILE + '.tmp', 'wb') as f:
+                pickle.dump({'titles': titles, 'stamp': self.all_titles_stamp},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(TITLES_CACHE_FILE + '.tmp', TITLES_CACHE_FILE)
+        except OSError as e:
+            log.exception(e)
+
+    def match_titles(self, query: str, titles_list: list, processed_list: list) -> list:
+        """Score a normalized query against every cached title in one C++ batch call.
+
+        Returns the best matching original titles in descending score order. The
+        caller passes its own snapshot of the parallel title lists, because a cache
+        refresh may swap self.titles_list/self.processed_list while this runs in
+        the executor, and the positional scores are only valid against the lists
+        that produced them."""
+        scores = process.cdist([query], processed_list,
+                               scorer=fuzz.WRatio,
+                               processor=None,  # titles and query are already normalized
+                               score_cutoff=self.fuzzy_cutoff,
+                               workers=-1)[0]
+        # O(N) partial selection of the top K, then sort only those K
+        limit = min(self.title_limit, len(scores))
+        best = np.argpartition(scores, -limit)[-limit:]
+        best = best[np.argsort(scores[best])[::-1]]
+        # cdist zeroes out scores below the cutoff rather than dropping them
+        return [titles_list[i] for i in best if scores[i] >= self.fuzzy_cutoff]
+
+    def title_to_url(self, title: str) -> str:
+        """Derive the full URL for an article title without asking the API.
+
+        Article URLs on gamepedia wikis are deterministic: the title with spaces
+        replaced by underscores, percent-encoded, under the wiki root."""
+        return self.base_url + quote(title.replace(' ', '_'), safe='/:')
 
     async def pageids_to_urls(self, pageids: list) -> list:
         """Return a list of the full URLs for a list of existing page IDs."""
-        str_pageids = [str(pageid) for pageid in pageids]
         params = {'format': 'json',
+                  'formatversion': 2,
                   'action': 'query',
                   'prop': 'info',
                   'inprop': 'url',
-                  'pageids': '|'.join(str_pageids)}
+                  'pageids': '|'.join(str(pageid) for pageid in pageids)}
         async with http_session.get(url=self.url, params=params) as reply:
-            response = await reply.json()
-        urls = [response['query']['pages'][str(pageid)]['fullurl'] for pageid in pageids]
-        return urls
+            response = orjson.loads(await reply.read())
+        # formatversion 2 returns the pages as a list rather than a dict keyed
+        # by stringified page ID
+        fullurls = {page['pageid']: page['fullurl'] for page in response['query']['pages']}
+        return [fullurls[pageid] for pageid in pageids]
 
     @command()
     async def wiki(self, ctx: Context, *args):
-        """Search titles of articles for the given text."""
+        """Fuzzy search the titles of articles for the given text."""
         log.info(f'({ctx.message.channel}) <{ctx.message.author}> {ctx.message.content}')
-        srquery = ' '.join(args)
-        if str.isspace(srquery):  # If no search term specified, return basic help
+        query = ' '.join(args)
+        if query == '' or str.isspace(query):  # If no search term specified, return basic help
             return await ctx.send(embed=Embed(title='?wiki', description='Search the official '
                                               'Caves of Qud wiki for matching titles.'
                                               '\n\nSyntax: ?wiki (search query)'))
-        params = {'format': 'json',
-                  'action': 'query',
-                  'list': 'search',
-                  'srnamespace': '0|14|10000',
-                  'srwhat': 'text',
-                  'srlimit': self.title_limit,
-                  'srsearch': 'intitle:' + srquery}
-        async with http_session.get(url=self.url, params=params) as reply:
-            response = await reply.json()
-        if 'error' in response:
-            try:
-                info = ''.join(response['error']['info'])
-                return await ctx.send(f'Sorry, that query resulted in a search error: {info}')
-            except ValueError as e:
-                log.exception(e)
-                return await ctx.send(f'Sorry, that query resulted in a search error with no'
-                                      ' error message. Exception logged.')
-        results = response['query']['search']
-        if len(results) == 0:
-            return await ctx.send('Sorry, that query didn\'t find any article titles.')
-        urls = await self.pageids_to_urls([item['pageid'] for item in results])
-        reply = ''
-        for match, url in zip(results, urls):
-            title = match['title']
-            reply += f'\n[{title}]({url})'
+        await self.refresh_titles_cache()
+        # repeat queries reuse the previous reply; keying on the cache stamp makes
+        # entries expire automatically when the title cache refreshes
+        key = (utils.default_process(query), self.all_titles_stamp)
+        reply = self.query_cache.get(key)
+        if reply is not None:
+            self.query_cache.move_to_end(key)
+        else:
+            loop = asyncio.get_running_loop()
+            # fuzzy matching the full title list is compute-bound, so run it in an
+            # executor so we can keep processing other commands in the meantime
+            titles_list, processed_list = self.titles_list, self.processed_list
+            results = await loop.run_in_executor(self.pool, self.match_titles, key[0],
+                                                 titles_list, processed_list)
+            if len(results) == 0:
+                return await ctx.send('Sorry, that query didn\'t find any article titles.')
+            reply = '\n'.join(f'[{title}]({self.title_to_url(title)})' for title in results)
+            self.query_cache[key] = reply
+            if len(self.query_cache) > QUERY_CACHE_SIZE:
+                self.query_cache.popitem(last=False)
         embed = Embed(colour=Colour(0xc3c9b1),
                       description=reply)
         await ctx.send(embed=embed)
@@ -81,6 +248,7 @@ class Wiki(Cog):
         """Search all articles for the given text."""
         log.info(f'({ctx.message.channel}) <{ctx.message.author}> {ctx.message.content}')
         params = {'format': 'json',
+                  'formatversion': 2,
                   'action': 'query',
                   'list': 'search',
                   'srsearch': ' '.join(args),
@@ -89,27 +257,24 @@ class Wiki(Cog):
                   'srlimit': self.fulltext_limit,
                   'srprop': 'snippet'}
         async with http_session.get(url=self.url, params=params) as reply:
-            response = await reply.json()
+            response = orjson.loads(await reply.read())
         if 'error' in response:
             try:
                 info = ''.join(response['error']['info'])
                 return await ctx.send(f'Sorry, that query resulted in a search error: {info}')
             except ValueError as e:
                 log.exception(e)
-                return await ctx.send(f'Sorry, that query resulted in a search error with no'
+                return await ctx.send('Sorry, that query resulted in a search error with no'
                                       ' error message. Exception logged.')
         matches = response['query']['searchinfo']['totalhits']
         if matches == 0:
-            return await ctx.send(f'Sorry, no matches were found for that query.')
+            return await ctx.send('Sorry, no matches were found for that query.')
         results = response['query']['search']
-        urls = await self.pageids_to_urls([item['pageid'] for item in results])
-        reply = ''
-        for num, (match, url) in enumerate(zip(results, urls), start=1):
+        lines = []
+        for match in results:
             title = match['title']
-            reply += f'[{title}]({url}): '
-            snippet = match['snippet'].replace('<span class="searchmatch">', '**')
-            snippet = snippet.replace('</span>', '**')
-            reply += snippet + '\n'
+            snippet = SEARCHMATCH_PATTERN.sub('**', match['snippet'])
+            lines.append(f'[{title}]({self.title_to_url(title)}): {snippet}')
         embed = Embed(colour=Colour(0xc3c9b1),
-                      description=reply)
+                      description='\n'.join(lines))
         await ctx.send(embed=embed)
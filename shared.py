@@ -20,7 +20,9 @@ async def create_http_session():
 
     aiohttp strongly advises the use of only one session per application, and also
     disallows the creation of this session from outside a coroutine."""
-    session = aiohttp.ClientSession()
+    # ask for compressed responses explicitly: the wiki's JSON (especially the
+    # allpages title dumps) compresses 5-10x, and aiohttp decompresses for us
+    session = aiohttp.ClientSession(headers={'Accept-Encoding': 'gzip, deflate'})
     return session
 
 